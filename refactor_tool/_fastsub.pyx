@@ -0,0 +1,45 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""Compiled word-boundary substitution used by the rename string pass.
+
+Build in place with ``cythonize -i refactor_tool/_fastsub.pyx``; when the extension is missing,
+rename.py falls back to the equivalent regex.
+"""
+
+from cpython.unicode cimport Py_UNICODE_ISALNUM
+
+
+cdef inline bint _is_word(Py_UCS4 ch):
+    # Same definition as the ``\w`` class of ``re`` for str patterns
+    return ch == u"_" or Py_UNICODE_ISALNUM(ch)
+
+
+def word_boundary_sub(str text, str old, str new):
+    """Replace ``old`` wherever it is not preceded or followed by a word character.
+
+    Matches ``re.sub(rf"(?<!\\w){re.escape(old)}(?!\\w)", new, text)`` and returns ``text``
+    itself when nothing was replaced.
+    """
+    cdef Py_ssize_t n = len(text)
+    cdef Py_ssize_t m = len(old)
+    cdef Py_ssize_t pos = 0
+    cdef Py_ssize_t last = 0
+    cdef Py_ssize_t hit
+    cdef list parts = []
+    if m == 0:
+        return text
+    while True:
+        # str.find runs CPython's two-way/memchr search over the raw buffer
+        hit = text.find(old, pos)
+        if hit < 0:
+            break
+        if (hit == 0 or not _is_word(text[hit - 1])) and (hit + m >= n or not _is_word(text[hit + m])):
+            parts.append(text[last:hit])
+            parts.append(new)
+            last = hit + m
+            pos = last
+        else:
+            pos = hit + 1
+    if not parts:
+        return text
+    parts.append(text[last:])
+    return "".join(parts)
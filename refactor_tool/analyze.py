@@ -1,18 +1,40 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import IO, Dict, List, Tuple
+import ast
+import contextlib
+import importlib.util
 
-import libcst as cst
 from libcst.metadata import PositionProvider
 
-from .project import read_text
+from .project import map_files
 from .readability import find_potential_dead_imports
 from .diff_utils import ChangeSet
 import shutil
 import tempfile
 import subprocess
 import os
+import sys
+
+
+def _analyze_one(path_str: str) -> Tuple[int, int, int, List[Tuple[str, int, str]]]:
+    f = Path(path_str)
+    # Count and parse straight from bytes; ast.parse decodes in C, so no Python str is built
+    data = f.read_bytes()
+    lines = data.count(b"\n") + 1 if data else 0
+    try:
+        tree = ast.parse(data)
+    except Exception:
+        return lines, 0, 0, []
+    functions = 0
+    classes = 0
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions += 1
+        elif isinstance(node, ast.ClassDef):
+            classes += 1
+    return lines, functions, classes, find_potential_dead_imports(f, data, tree)
 
 
 def analyze_project(root: Path, files: List[Path]) -> Dict:
@@ -20,19 +42,11 @@ def analyze_project(root: Path, files: List[Path]) -> Dict:
     functions = 0
     classes = 0
     potential_dead_imports: List[Tuple[str, int, str]] = []
-    for f in files:
-        text = read_text(f)
-        total_lines += text.count("\n") + 1 if text else 0
-        try:
-            mod = cst.parse_module(text)
-        except Exception:
-            continue
-        for node in mod.body:
-            if isinstance(node, cst.FunctionDef):
-                functions += 1
-            elif isinstance(node, cst.ClassDef):
-                classes += 1
-        potential_dead_imports.extend(find_potential_dead_imports(f, text))
+    for lines, funcs, klasses, dead in map_files(_analyze_one, [str(f) for f in files]):
+        total_lines += lines
+        functions += funcs
+        classes += klasses
+        potential_dead_imports.extend(dead)
     return {
         "files": len(files),
         "lines": total_lines,
@@ -42,27 +56,71 @@ def analyze_project(root: Path, files: List[Path]) -> Dict:
     }
 
 
-def run_spec_and_tests(sample_root: Path, verbose: bool = False) -> Dict:
-    # Work in a temporary copy to avoid altering the original sample project
-    tmp_dir = Path(tempfile.mkdtemp(prefix="refactor_spec_"))
-    workdir = tmp_dir / "project"
-    shutil.copytree(sample_root, workdir)
+def _pytest_args(project_dir: Path, verbose: bool) -> List[str]:
+    # Run pytest from this interpreter, the same environment the xdist check below looks in
+    args = [sys.executable, "-m", "pytest", "-q" if not verbose else "-vv"]
+    if importlib.util.find_spec("xdist") is not None:
+        args += ["-n", "auto", "-p", "no:cacheprovider", "--dist=loadfile"]
+    args.append(str(project_dir / "tests"))
+    return args
 
-    # Run baseline tests
+
+def _start_pytest(project_dir: Path, verbose: bool, output: IO[bytes]) -> subprocess.Popen:
     env = os.environ.copy()
     existing_pp = env.get("PYTHONPATH", "")
-    env["PYTHONPATH"] = str(workdir) + (os.pathsep + existing_pp if existing_pp else "")
-
-    base_rc = subprocess.call(
-        [
-            "pytest",
-            "-q" if not verbose else "-vv",
-            str(workdir / "tests"),
-        ],
-        cwd=str(workdir),
+    env["PYTHONPATH"] = str(project_dir) + (os.pathsep + existing_pp if existing_pp else "")
+    return subprocess.Popen(
+        _pytest_args(project_dir, verbose),
+        cwd=str(project_dir),
         env=env,
+        stdout=output,
+        stderr=subprocess.STDOUT,
     )
 
+
+def _replay_output(output: IO[bytes]) -> None:
+    output.seek(0)
+    sys.stdout.buffer.write(output.read())
+    sys.stdout.flush()
+
+
+def run_spec_and_tests(sample_root: Path, verbose: bool = False) -> Dict:
+    # Work in temporary copies to avoid altering the original sample project. The baseline
+    # run gets its own copy so it can proceed while the refactor rewrites the other one.
+    tmp_dir = Path(tempfile.mkdtemp(prefix="refactor_spec_"))
+    workdir = tmp_dir / "project"
+    basedir = tmp_dir / "baseline"
+    shutil.copytree(sample_root, workdir)
+    shutil.copytree(sample_root, basedir)
+
+    try:
+        # Run baseline tests; output is buffered and replayed so the two runs do not interleave
+        with contextlib.ExitStack() as stack:
+            base_out = stack.enter_context(tempfile.TemporaryFile())
+            post_out = stack.enter_context(tempfile.TemporaryFile())
+            base_proc = _start_pytest(basedir, verbose, base_out)
+            try:
+                post_proc = _refactor_and_start_tests(workdir, verbose, post_out)
+            finally:
+                base_rc = base_proc.wait()
+                _replay_output(base_out)
+                # Only the refactored copy is reported back, so the baseline copy can go now
+                shutil.rmtree(basedir, ignore_errors=True)
+            post_rc = post_proc.wait()
+            _replay_output(post_out)
+    except BaseException:
+        # Nothing is reported on failure, so leave no copies behind either
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    return {
+        "baseline_tests_passed": base_rc == 0,
+        "post_refactor_tests_passed": post_rc == 0,
+        "tmp_project": str(workdir),
+    }
+
+
+def _refactor_and_start_tests(workdir: Path, verbose: bool, output: IO[bytes]) -> subprocess.Popen:
     # Perform a simple rename and extract for the sample project
     from . import rename as rename_mod
     from . import extract as extract_mod
@@ -83,19 +141,12 @@ def run_spec_and_tests(sample_root: Path, verbose: bool = False) -> Dict:
     change_set.apply(None)
 
     # extract a block from process_data in main.py
-    # Find the exact statement range for the loop block in sample/main.py by scanning lines
     # We know the duplicate sum loop appears after cleaning and before avg assignment
-    main_text = (workdir / "sample" / "main.py").read_text(encoding="utf-8")
-    lines = main_text.splitlines()
-    loop_start = None
-    loop_end = None
-    for i, line in enumerate(lines, start=1):
-        if loop_start is None and line.strip().startswith("total = 0"):
-            loop_start = i
-        if loop_start is not None and line.strip().startswith("avg ="):
-            loop_end = i - 1
-            break
-    if loop_start is None or loop_end is None:
+    try:
+        loop_start, loop_end = extract_mod.find_block_by_prefix(
+            workdir / "sample" / "main.py", "process_data", "total = 0", "avg ="
+        )
+    except extract_mod.ExtractError:
         loop_start, loop_end = 10, 15  # fallback
 
     cs2 = extract_mod.extract_function(
@@ -109,20 +160,4 @@ def run_spec_and_tests(sample_root: Path, verbose: bool = False) -> Dict:
     cs2.apply(None)
 
     # Run tests again
-    post_rc = subprocess.call(
-        [
-            "pytest",
-            "-q" if not verbose else "-vv",
-            str(workdir / "tests"),
-        ],
-        cwd=str(workdir),
-        env=env,
-    )
-
-    return {
-        "baseline_tests_passed": base_rc == 0,
-        "post_refactor_tests_passed": post_rc == 0,
-        "tmp_project": str(workdir),
-    }
-
-
+    return _start_pytest(workdir, verbose, output)
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from importlib import metadata
+from pathlib import Path
+from typing import Callable, Dict, Tuple, Union
+import functools
+import hashlib
+import mmap
+import os
+import pickle
+import tempfile
+
+import libcst as cst
+
+from .project import decode_text, read_text
+
+
+try:
+    LIBCST_VERSION = metadata.version("libcst")
+except metadata.PackageNotFoundError:
+    LIBCST_VERSION = "unknown"
+
+_stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
+ReadableBuffer = Union[bytes, mmap.mmap]
+
+
+def cache_dir() -> Path | None:
+    # REFACTOR_TOOL_CACHE_DIR overrides the default ~/.cache location; set but empty, it turns
+    # the on-disk cache off (the environment is inherited by worker processes)
+    override = os.environ.get("REFACTOR_TOOL_CACHE_DIR")
+    if override == "":
+        return None
+    if override:
+        base = Path(override)
+    else:
+        base = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "refactor_tool"
+    return base / "ast" / LIBCST_VERSION
+
+
+def cache_stats() -> Dict[str, int]:
+    return dict(_stats)
+
+
+def _load(entry: Path) -> cst.Module | None:
+    try:
+        with entry.open("rb") as fh:
+            mod = pickle.load(fh)
+    except Exception:
+        # Missing, truncated or incompatible entries are treated as a miss
+        return None
+    return mod if isinstance(mod, cst.Module) else None
+
+
+def _store(entry: Path, mod: cst.Module) -> None:
+    try:
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(entry.parent), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                pickle.dump(mod, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, entry)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except Exception:
+        # The cache is best-effort; a read-only or full disk must not break refactors
+        pass
+
+
+def _cached_parse(key: str, get_text: Callable[[], str]) -> cst.Module:
+    directory = cache_dir()
+    if directory is None:
+        _stats["misses"] += 1
+        return cst.parse_module(get_text())
+    entry = directory / f"{key}.pkl"
+    mod = _load(entry)
+    if mod is not None:
+        _stats["hits"] += 1
+        return mod
+    _stats["misses"] += 1
+    mod = cst.parse_module(get_text())
+    _store(entry, mod)
+    return mod
+
+
+def parse_module_cached(path: Path, text: str) -> cst.Module:
+    """Parse ``text`` with libCST, reusing a pickled tree from a previous run when possible.
+
+    Entries are content-addressed by the SHA-256 of ``text`` and namespaced by the libCST
+    version, so stale trees are never returned. ``path`` is informational only.
+    """
+    return _cached_parse(hashlib.sha256(text.encode("utf-8")).hexdigest(), lambda: text)
+
+
+def parse_source_cached(path: Path, source: ReadableBuffer) -> cst.Module:
+    """Like :func:`parse_module_cached`, but for raw UTF-8 file contents (bytes or an mmap).
+
+    Without any ``\\r`` the decoded text encodes back to exactly ``source``, so the key is
+    hashed straight from the buffer and nothing is decoded on a cache hit.
+    """
+    if source.find(b"\r") == -1:
+        return _cached_parse(hashlib.sha256(source).hexdigest(), lambda: decode_text(source[:]))
+    return parse_module_cached(path, decode_text(source[:]))
+
+
+# Each command loads only a file or two this way; a small bound keeps repeated library calls
+# cheap without pinning every tree (and its source) for the life of the process
+@functools.lru_cache(maxsize=8)
+def _load_module(path: Path, mtime_ns: int, size: int) -> Tuple[str, cst.Module]:
+    text = read_text(path)
+    return text, parse_module_cached(path, text)
+
+
+def load_module(path: Path) -> Tuple[str, cst.Module]:
+    """Return ``(text, module)`` for ``path``, reusing the tree of recently loaded file versions.
+
+    Entries are keyed on ``(path, st_mtime_ns, st_size)`` so files rewritten by an applied
+    ChangeSet are picked up again on the next call; misses go through the on-disk parse cache.
+    """
+    st = path.stat()
+    return _load_module(path, st.st_mtime_ns, st.st_size)
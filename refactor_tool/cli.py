@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import json
+import os
 from pathlib import Path
 from typing import Optional, List
 
@@ -8,6 +9,7 @@ import typer
 from rich.console import Console
 from rich.table import Table
 
+from .ast_cache import cache_stats
 from .project import discover_python_files
 from .diff_utils import ChangeSet
 from . import analyze as analyze_mod
@@ -26,6 +28,23 @@ def _split_patterns(pats: Optional[str]) -> List[str]:
     return [p.strip() for p in pats.split(",") if p.strip()]
 
 
+def _print_cache_stats() -> None:
+    stats = cache_stats()
+    console.print(f"[dim]AST cache: {stats['hits']} hit(s), {stats['misses']} miss(es)[/dim]")
+
+
+@app.callback()
+def _main_options(
+    ctx: typer.Context,
+    show_cache_stats: bool = typer.Option(False, "--cache-stats", help="Print AST cache hit/miss counts for this process on exit"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Do not read or write the on-disk AST cache"),
+):
+    if no_cache:
+        os.environ["REFACTOR_TOOL_CACHE_DIR"] = ""
+    if show_cache_stats:
+        ctx.call_on_close(_print_cache_stats)
+
+
 @app.command()
 def analyze(
     root: str = typer.Argument(".", help="Project root directory"),
@@ -61,6 +80,7 @@ def rename(
     root: str = typer.Option(".", help="Project root"),
     include: Optional[str] = typer.Option(None, help="Comma-separated include globs"),
     exclude: Optional[str] = typer.Option(None, help="Comma-separated exclude globs"),
+    jobs: Optional[int] = typer.Option(None, min=1, help="Worker processes for the project scan (default: CPU count; 1 = serial)"),
     preview: bool = typer.Option(False, help="Show diffs without writing"),
     apply: bool = typer.Option(False, help="Write changes to disk"),
 ):
@@ -84,6 +104,7 @@ def rename(
         new_name=to,
         function_name=function,
         class_name=klass,
+        jobs=jobs,
     )
 
     if preview:
@@ -1,21 +1,87 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterator, List, Tuple
 import difflib
+import functools
+import hashlib
+import itertools
+import os
+import shutil
+import tempfile
+import zlib
 
 from rich.console import Console
 
+try:
+    import zstandard
+except ImportError:  # optional; zlib is always available
+    zstandard = None
+
+from .project import read_text
+
+
+# A spooled ChangeSet holds updated bodies in memory up to this size, then moves them to disk
+SPOOL_MEMORY_LIMIT = 8 * 1024 * 1024
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# Updated bodies are held compressed; large renames touch thousands of files and source text
+# shrinks several times over
+if zstandard is not None:
+    _compress = zstandard.ZstdCompressor(level=3).compress
+    _decompress = zstandard.ZstdDecompressor().decompress
+else:
+    _compress = functools.partial(zlib.compress, level=1)
+    _decompress = zlib.decompress
+
+
+def _deflate(text: str) -> bytes:
+    return _compress(text.encode("utf-8"))
+
+
+@functools.lru_cache(maxsize=64)
+def _inflate(blob: bytes) -> str:
+    # Rendering a diff and then applying it reads each body twice; keep recent ones around
+    return _decompress(blob).decode("utf-8")
+
+
+@dataclass
+class ChangeConflictError(Exception):
+    message: str
+
 
 @dataclass
 class FileChange:
+    # Only a digest of the original text is kept in memory; the text itself is reloaded
+    # (normally from disk) when a diff is actually rendered. The updated text is compressed.
     path: Path
-    original: str
-    updated: str
+    updated_blob: bytes
+    original_digest: str
+    original_loader: Callable[[], str]
+
+    @property
+    def updated(self) -> str:
+        return _inflate(self.updated_blob)
+
+    @property
+    def original(self) -> str:
+        text = self.original_loader()
+        if _digest(text) != self.original_digest:
+            raise ChangeConflictError(f"{self.path} was modified after the change was computed")
+        return text
+
+    def verify(self) -> None:
+        """Raise ChangeConflictError if the original no longer matches what was diffed."""
+        _ = self.original
 
     def has_change(self) -> bool:
-        return self.original != self.updated
+        return self.original_digest != _digest(self.updated)
 
     def unified_diff(self) -> str:
         original_lines = self.original.splitlines(keepends=True)
@@ -30,27 +96,97 @@ class FileChange:
         return "".join(diff)
 
 
+def _write_change(change: FileChange) -> None:
+    # Write next to the target and rename over it, so readers never observe a partial file;
+    # a symlink is resolved first so the file it points to is updated, not the link replaced
+    target = Path(os.path.realpath(change.path))
+    fd, tmp = tempfile.mkstemp(dir=str(target.parent), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(change.updated)
+        shutil.copymode(target, tmp)
+        os.replace(tmp, target)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+@dataclass
+class _SpooledChange:
+    offset: int
+    size: int
+    original_digest: str
+    original_loader: Callable[[], str]
+
+
 class ChangeSet:
-    def __init__(self) -> None:
+    def __init__(self, spool: bool = False) -> None:
+        """Collect file changes; iterate the set to get one FileChange at a time.
+
+        With ``spool``, updated bodies go to a temporary file (in memory up to
+        SPOOL_MEMORY_LIMIT, on disk beyond it) and each is read back only while its change is
+        being previewed or applied, so resident memory stays bounded on very large refactors.
+        """
         self._changes: Dict[Path, FileChange] = {}
+        self._spooled: Dict[Path, _SpooledChange] = {}
+        self._spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_LIMIT) if spool else None
+
+    def add(
+        self, path: Path, original: str, updated: str, original_loader: Callable[[], str] | None = None
+    ) -> None:
+        """Record ``path`` going from ``original`` to ``updated``.
 
-    def add(self, path: Path, original: str, updated: str) -> None:
-        change = FileChange(path=path, original=original, updated=updated)
-        if change.has_change():
-            self._changes[path] = change
+        ``original`` must be what ``original_loader`` (by default, reading ``path``) returns;
+        only its digest is retained, which is also used to refuse applying over a file that
+        changed in the meantime.
+        """
+        if original == updated:
+            return
+        self._put(
+            FileChange(
+                path=path,
+                updated_blob=_deflate(updated),
+                original_digest=_digest(original),
+                original_loader=original_loader or functools.partial(read_text, path),
+            )
+        )
+
+    def _put(self, change: FileChange) -> None:
+        if self._spool is None:
+            self._changes[change.path] = change
+            return
+        # Bodies are appended; a later change to the same path just points past the old one
+        self._spool.seek(0, os.SEEK_END)
+        offset = self._spool.tell()
+        self._spool.write(change.updated_blob)
+        self._spooled[change.path] = _SpooledChange(
+            offset, len(change.updated_blob), change.original_digest, change.original_loader
+        )
+
+    def __iter__(self) -> Iterator[FileChange]:
+        if self._spool is None:
+            yield from list(self._changes.values())
+            return
+        for path, entry in list(self._spooled.items()):
+            self._spool.seek(entry.offset)
+            blob = self._spool.read(entry.size)
+            yield FileChange(path, blob, entry.original_digest, entry.original_loader)
+
+    def __len__(self) -> int:
+        return len(self._spooled) if self._spool is not None else len(self._changes)
 
     def merge(self, other: "ChangeSet") -> None:
-        for path, change in other._changes.items():
-            self._changes[path] = change
+        for change in other:
+            self._put(change)
 
     def is_empty(self) -> bool:
-        return not self._changes
+        return not len(self)
 
     def preview(self, console: Console) -> None:
         if self.is_empty():
             console.print("[green]No changes.[/green]")
             return
-        for change in self._changes.values():
+        for change in self:
             diff = change.unified_diff()
             console.print(f"[cyan]Diff for {change.path}[/cyan]")
             if not diff:
@@ -59,9 +195,20 @@ class ChangeSet:
                 console.print(diff)
 
     def apply(self, console: Console | None = None) -> None:
-        for change in self._changes.values():
-            change.path.write_text(change.updated, encoding="utf-8")
+        # Check every file first so a conflict never leaves the change set half applied
+        for change in self:
+            change.verify()
+        count = len(self)
+        if count:
+            # Writes are independent per path and release the GIL, so overlap them on threads;
+            # changes are pulled in batches so a spooled set is never loaded all at once
+            workers = min(32, count)
+            pending = iter(self)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                while True:
+                    batch = list(itertools.islice(pending, workers * 4))
+                    if not batch:
+                        break
+                    list(executor.map(_write_change, batch))
         if console:
-            console.print(f"[green]Applied {len(self._changes)} file(s).[/green]")
-
-
+            console.print(f"[green]Applied {count} file(s).[/green]")
@@ -2,11 +2,14 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional, Set, Tuple
+from typing import Iterable, List, Mapping, Optional, Set, Tuple
+import bisect
+import functools
 
 import libcst as cst
-from libcst.metadata import PositionProvider
+from libcst.metadata import CodeRange, PositionProvider
 
+from .ast_cache import parse_module_cached
 from .diff_utils import ChangeSet
 from .project import read_text
 
@@ -16,32 +19,62 @@ class ExtractError(Exception):
     message: str
 
 
-def _gather_statements_by_line(mod: cst.Module, func_name: str) -> Tuple[cst.FunctionDef, List[Tuple[int, int, cst.CSTNode]]]:
-    wrapper = cst.MetadataWrapper(mod)
-    positions = wrapper.resolve(PositionProvider)
-    wmod = wrapper.module
+@functools.lru_cache(maxsize=64)
+def _wrap_with_positions(path: Path, text: str) -> Tuple[cst.MetadataWrapper, Mapping[cst.CSTNode, CodeRange]]:
+    # Content-addressed: a changed file has different text and therefore gets a fresh tree.
+    # Edits go through with_changes and never mutate the tree in place, so MetadataWrapper's
+    # defensive deep copy is unnecessary and the positions refer to the nodes we edit.
+    wrapper = cst.MetadataWrapper(parse_module_cached(path, text), unsafe_skip_copy=True)
+    return wrapper, wrapper.resolve(PositionProvider)
+
+
+def _gather_statements_by_line(
+    mod: cst.Module, positions: Mapping[cst.CSTNode, CodeRange], func_name: str
+) -> Tuple[cst.FunctionDef, List[Tuple[int, int, cst.CSTNode]]]:
     fn: Optional[cst.FunctionDef] = None
-    for node in wmod.body:
+    for node in mod.body:
         if isinstance(node, cst.FunctionDef) and node.name.value == func_name:
             fn = node
             break
     if not fn:
         raise ExtractError("Function not found")
-    stmt_positions: List[Tuple[int, int, cst.CSTNode]] = []
-    for stmt in fn.body.body:
-        try:
-            start, end = stmt.get_lines()
-        except Exception:
-            try:
-                pos = positions[stmt]
-                start, end = pos.start.line, pos.end.line
-            except Exception:
-                continue
-        stmt_positions.append((start, end, stmt))
+    stmt_positions: List[Tuple[int, int, cst.CSTNode]] = [
+        (positions[stmt].start.line, positions[stmt].end.line, stmt) for stmt in fn.body.body
+    ]
     return fn, stmt_positions
 
 
-def _collect_names_used(node: cst.CSTNode) -> Set[str]:
+def _statement_source(mod: cst.Module, stmt: cst.CSTNode) -> str:
+    # Render the statement itself, without the blank/comment lines libCST attaches in front of it
+    if isinstance(stmt, cst.SimpleStatementLine):
+        return mod.code_for_node(stmt.body[0])
+    return mod.code_for_node(stmt.with_changes(leading_lines=()))
+
+
+def find_block_by_prefix(
+    file_path: Path, function_name: str, start_prefix: str, end_prefix: str
+) -> Tuple[int, int]:
+    """Locate a block in a top-level function by the source prefixes of its bounding statements.
+
+    Returns ``(start_line, end_line)`` where the block starts at the first statement beginning
+    with ``start_prefix`` and ends on the line before the next statement beginning with
+    ``end_prefix``, suitable for passing to :func:`extract_function`.
+    """
+    wrapper, positions = _wrap_with_positions(file_path, read_text(file_path))
+    mod = wrapper.module
+    _, stmt_positions = _gather_statements_by_line(mod, positions, function_name)
+    start_line: Optional[int] = None
+    for s_line, _, stmt in stmt_positions:
+        code = _statement_source(mod, stmt)
+        if start_line is None:
+            if code.startswith(start_prefix):
+                start_line = s_line
+        elif code.startswith(end_prefix):
+            return start_line, s_line - 1
+    raise ExtractError("Block not found")
+
+
+def _collect_names_used(nodes: Iterable[cst.CSTNode]) -> Set[str]:
     used: Set[str] = set()
 
     class V(cst.CSTVisitor):
@@ -49,11 +82,13 @@ def _collect_names_used(node: cst.CSTNode) -> Set[str]:
             used.add(n.value)
             return None
 
-    node.visit(V())
+    visitor = V()
+    for node in nodes:
+        node.visit(visitor)
     return used
 
 
-def _collect_assigned_in_block(node: cst.CSTNode) -> Set[str]:
+def _collect_assigned_in_block(nodes: Iterable[cst.CSTNode]) -> Set[str]:
     assigned: Set[str] = set()
 
     class V(cst.CSTVisitor):
@@ -78,14 +113,20 @@ def _collect_assigned_in_block(node: cst.CSTNode) -> Set[str]:
                     assigned.add(item.asname.name.value)
             return None
 
-    node.visit(V())
+    visitor = V()
+    for node in nodes:
+        node.visit(visitor)
     return assigned
 
 
-def _contains_ambiguous_control_flow(node: cst.CSTNode) -> bool:
+def _contains_ambiguous_control_flow(nodes: Iterable[cst.CSTNode]) -> bool:
     blocked = False
 
     class V(cst.CSTVisitor):
+        def on_visit(self, n: cst.CSTNode) -> bool:
+            # Stop descending as soon as one offending statement has been seen
+            return not blocked and super().on_visit(n)
+
         def visit_Return(self, n: cst.Return) -> Optional[bool]:
             nonlocal blocked
             blocked = True
@@ -111,7 +152,11 @@ def _contains_ambiguous_control_flow(node: cst.CSTNode) -> bool:
             blocked = True
             return None
 
-    node.visit(V())
+    visitor = V()
+    for node in nodes:
+        node.visit(visitor)
+        if blocked:
+            break
     return blocked
 
 
@@ -124,85 +169,55 @@ def extract_function(
     return_variable: Optional[str] = None,
 ) -> ChangeSet:
     text = read_text(file_path)
-    mod = cst.parse_module(text)
-
-    # Build metadata wrapper for positions, but keep editing the original mod tree
-    wrapper = cst.MetadataWrapper(mod)
-    positions = wrapper.resolve(PositionProvider)
-    wmod = wrapper.module
-
-    # Find function in both wrapper tree and base tree
-    w_fn: Optional[cst.FunctionDef] = None
-    for node in wmod.body:
-        if isinstance(node, cst.FunctionDef) and node.name.value == function_name:
-            w_fn = node
-            break
-    if not w_fn:
-        raise ExtractError("Function not found")
+    wrapper, positions = _wrap_with_positions(file_path, text)
+    mod = wrapper.module
 
     base_fn: Optional[cst.FunctionDef] = None
-    base_fn_index: Optional[int] = None
-    for i, node in enumerate(mod.body):
+    for node in mod.body:
         if isinstance(node, cst.FunctionDef) and node.name.value == function_name:
             base_fn = node
-            base_fn_index = i
             break
-    if not base_fn or base_fn_index is None:
-        raise ExtractError("Function not found in base module")
-
-    # Map wrapper statements to indices and line ranges
-    w_body = list(w_fn.body.body)
-    stmt_positions: List[Tuple[int, int, int]] = []  # (start, end, index)
-    for idx, stmt in enumerate(w_body):
-        try:
-            start, end = stmt.get_lines()
-        except Exception:
-            try:
-                pos = positions[stmt]
-                start, end = pos.start.line, pos.end.line
-            except Exception:
-                continue
-        stmt_positions.append((start, end, idx))
-
-    # Select indices by line range
-    selected_indices: List[int] = []
-    for s_line, e_line, idx in stmt_positions:
-        if s_line >= start_line and e_line <= end_line:
-            selected_indices.append(idx)
+    if not base_fn:
+        raise ExtractError("Function not found")
+
+    # Map statements to indices and line ranges
+    base_body = list(base_fn.body.body)
+    stmt_positions: List[Tuple[int, int, int]] = [  # (start, end, index)
+        (positions[stmt].start.line, positions[stmt].end.line, idx) for idx, stmt in enumerate(base_body)
+    ]
+
+    # Select indices by line range; statements are in source order, so start lines are sorted
+    starts = [s_line for s_line, _, _ in stmt_positions]
+    lo = bisect.bisect_left(starts, start_line)
+    hi = bisect.bisect_right(starts, end_line)
+    selected_indices: List[int] = [idx for _, e_line, idx in stmt_positions[lo:hi] if e_line <= end_line]
     if not selected_indices:
         raise ExtractError("No complete statements found in the given range")
     if selected_indices != list(range(min(selected_indices), max(selected_indices) + 1)):
         raise ExtractError("Selected lines do not form a contiguous block")
 
-    # Analyze names on wrapper nodes for convenience
-    selected_w_nodes = [w_body[i] for i in selected_indices]
-    block = cst.Module(body=selected_w_nodes)
-    used = _collect_names_used(block)
-    assigned = _collect_assigned_in_block(block)
-
-    # Base function body nodes (we will edit these)
-    base_body = list(base_fn.body.body)
+    selected_nodes = [base_body[i] for i in selected_indices]
+    used = _collect_names_used(selected_nodes)
+    assigned = _collect_assigned_in_block(selected_nodes)
 
     # Params from base function
     params = {p.name.value for p in base_fn.params.params}
     params |= {p.name.value for p in base_fn.params.kwonly_params}
 
-    # Prior assignments before the block in base tree
-    before_block = cst.Module(body=base_body[: min(selected_indices)])
-    assigned_before = _collect_assigned_in_block(before_block)
+    # Prior assignments before the block
+    assigned_before = _collect_assigned_in_block(base_body[: min(selected_indices)])
     free_vars = sorted([n for n in used if n not in assigned and (n in params or n in assigned_before)])
 
-    # Determine escaping assignments by checking usage later in base tree
-    following = cst.Module(body=base_body[max(selected_indices) + 1 :])
-    used_later = _collect_names_used(following)
+    # Determine escaping assignments by checking usage later in the function
+    used_later = _collect_names_used(base_body[max(selected_indices) + 1 :])
     escaping = sorted([n for n in assigned if n in used_later])
 
-    if _contains_ambiguous_control_flow(block):
+    if _contains_ambiguous_control_flow(selected_nodes):
         raise ExtractError("Ambiguous control flow detected in selected block; aborting")
     if len(escaping) > 1 and not return_variable:
         raise ExtractError("Multiple values escape the block; specify --return-var or select a simpler range")
 
-    # Build extracted function (based on base tree nodes)
+    # Build extracted function
     params_list = [cst.Param(name=cst.Name(n)) for n in free_vars]
     new_body_nodes = [n for n in base_body[min(selected_indices) : max(selected_indices) + 1]]
     ret_name: Optional[str] = return_variable or (escaping[0] if escaping else None)
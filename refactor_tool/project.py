@@ -1,8 +1,24 @@
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Iterable, Iterator, List
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, TypeVar
 import fnmatch
+import functools
+import os
+import re
+import shutil
+import subprocess
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Below this many work items a process pool costs more to start than it saves
+PARALLEL_MIN_ITEMS = 32
+
+# Paths per ripgrep invocation, well below typical ARG_MAX limits
+RG_BATCH_SIZE = 1000
 
 
 DEFAULT_EXCLUDES = [
@@ -13,26 +29,58 @@ DEFAULT_EXCLUDES = [
 ]
 
 
-def _matches_any(path: Path, patterns: List[str]) -> bool:
-    s = str(path.as_posix())
-    return any(fnmatch.fnmatch(s, pat) for pat in patterns)
+def _compile_globs(patterns: List[str]) -> re.Pattern[str]:
+    # One alternation regex per pattern list; normcase mirrors fnmatch.fnmatch semantics
+    return re.compile("|".join(fnmatch.translate(os.path.normcase(pat)) for pat in patterns))
+
+
+def _matches_any(path: Path, compiled: re.Pattern[str]) -> bool:
+    s = os.path.normcase(path.as_posix())
+    return compiled.match(s) is not None
+
+
+def _walk_python_files(root: Path, prune: re.Pattern[str] | None) -> Iterator[Path]:
+    # scandir reuses the d_type from readdir, so no per-entry stat is needed to tell dirs from files
+    stack = [str(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                # Spelled exactly like the file paths matched later (Path drops a leading './')
+                if prune is not None and prune.match(os.path.normcase(Path(entry.path).as_posix() + "/")):
+                    continue
+                stack.append(entry.path)
+            elif entry.name.endswith(".py") and entry.is_file():
+                yield Path(entry.path)
 
 
 def discover_python_files(
     root: Path, include: List[str] | None, exclude: List[str] | None
 ) -> Iterator[Path]:
-    inc = include or ["**/*.py"]
-    exc = (exclude or []) + DEFAULT_EXCLUDES
-    seen: set[Path] = set()
-    for pattern in inc:
-        for p in root.rglob("*.py"):
-            if _matches_any(p, exc):
-                continue
-            if not _matches_any(p, [pattern]):
-                continue
-            if p not in seen:
-                seen.add(p)
-                yield p
+    inc = _compile_globs(include or ["**/*.py"])
+    exc_patterns = (exclude or []) + DEFAULT_EXCLUDES
+    exc = _compile_globs(exc_patterns)
+    # A directory can be skipped wholesale when "<dir>/" matches an exclude glob ending in '*':
+    # that trailing wildcard then matches every path below it as well.
+    prunable = [pat for pat in exc_patterns if pat.endswith("*")]
+    prune = _compile_globs(prunable) if prunable else None
+    for p in _walk_python_files(root, prune):
+        if _matches_any(p, exc):
+            continue
+        if _matches_any(p, inc):
+            yield p
+
+
+def decode_text(data: bytes) -> str:
+    # Same result as read_text: UTF-8 with universal newlines
+    text = data.decode("utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
 
 
 def read_text(path: Path) -> str:
@@ -43,6 +91,7 @@ def write_text(path: Path, content: str) -> None:
     path.write_text(content, encoding="utf-8")
 
 
+@functools.lru_cache(maxsize=4096)
 def module_path_from_file(root: Path, file_path: Path) -> str | None:
     try:
         rel = file_path.relative_to(root)
@@ -61,3 +110,46 @@ def module_path_from_file(root: Path, file_path: Path) -> str | None:
     return ".".join(parts)
 
 
+
+
+def files_containing(files: Sequence[Path], needle: str) -> Optional[List[Path]]:
+    """Return the subset of ``files`` whose contents contain ``needle``, using ripgrep.
+
+    Returns ``None`` when ``rg`` is not installed or fails, so callers fall back to their own
+    per-file check. Order follows ``files``.
+    """
+    rg = shutil.which("rg")
+    if rg is None or not files:
+        return None
+    by_name = {str(f): f for f in files}
+    found = set()
+    names = list(by_name)
+    for start in range(0, len(names), RG_BATCH_SIZE):
+        batch = names[start : start + RG_BATCH_SIZE]
+        try:
+            proc = subprocess.run(
+                [rg, "--no-config", "--no-messages", "-l", "--fixed-strings", "--", needle, *batch],
+                capture_output=True,
+            )
+        except OSError:
+            return None
+        # 0: matches, 1: no matches; anything else means some paths were not searched
+        if proc.returncode not in (0, 1):
+            return None
+        found.update(os.fsdecode(line) for line in proc.stdout.splitlines())
+    return [by_name[name] for name in names if name in found]
+
+
+def map_files(
+    func: Callable[[T], R], items: Iterable[T], jobs: Optional[int] = None, chunksize: int = 16
+) -> List[R]:
+    """Apply ``func`` to every item, fanning out to worker processes for large inputs.
+
+    ``func`` must be a picklable top-level function. Results keep the input order.
+    ``jobs`` of 1 forces serial execution; ``None`` uses one worker per CPU.
+    """
+    work = list(items)
+    if jobs == 1 or len(work) < PARALLEL_MIN_ITEMS:
+        return [func(item) for item in work]
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        return list(executor.map(func, work, chunksize=chunksize))
@@ -2,110 +2,303 @@ from __future__ import annotations
 
 from pathlib import Path
 from typing import Iterable, List, Tuple
+import ast
+import functools
 import re
 
 import libcst as cst
 
+from .ast_cache import parse_module_cached
 from .diff_utils import ChangeSet
-from .project import read_text
+from .project import map_files, read_text
 
 
-HIDDEN_CHARS_PATTERN = re.compile(
-    "[\u200B\u200C\u200D\uFEFF]"  # zero width space, non-joiners, BOM
+# Import lines carrying a noqa comment are left alone, whatever the linter code
+_NOQA_RE = re.compile(r"#\s*noqa", re.IGNORECASE)
+
+# str.translate deletes these in one C-level pass, much cheaper than a regex substitution
+_HIDDEN_TRANS = dict.fromkeys(
+    [0x200B, 0x200C, 0x200D, 0xFEFF], None  # zero width space, non-joiners, BOM
 )
 
 
+def _has_hidden(text: str) -> bool:
+    return any(chr(code) in text for code in _HIDDEN_TRANS)
+
+
 def _normalize_newlines(text: str) -> str:
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
-    return text
+    if "\r" not in text:
+        return text
+    return text.replace("\r\n", "\n").replace("\r", "\n")
 
 
 def _strip_hidden(text: str) -> str:
-    return HIDDEN_CHARS_PATTERN.sub("", text)
+    return text.translate(_HIDDEN_TRANS)
 
 
-def _remove_dead_imports_in_module(text: str) -> str:
+def _string_annotation_names(value: str) -> List[str]:
+    # Forward references such as "OD" or "List['OD']" name imports without an ast.Name node
     try:
-        mod = cst.parse_module(text)
-    except Exception:
-        return text
+        expr = ast.parse(value.strip(), mode="eval")
+    except (SyntaxError, ValueError):
+        return []
+    names: List[str] = []
+    for node in ast.walk(expr):
+        if isinstance(node, ast.Name):
+            names.append(node.id)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            names.extend(_string_annotation_names(node.value))
+    return names
 
-    used_names: set[str] = set()
 
-    class Usage(cst.CSTVisitor):
-        def visit_Name(self, node: cst.Name):
-            used_names.add(node.value)
+def _annotations(node: ast.AST) -> List[ast.AST]:
+    if isinstance(node, ast.arg):
+        return [node.annotation] if node.annotation is not None else []
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return [node.returns] if node.returns is not None else []
+    if isinstance(node, ast.AnnAssign):
+        return [node.annotation]
+    return []
 
-    mod.visit(Usage())
 
-    class Prune(cst.CSTTransformer):
-        def leave_ImportFrom(self, node: cst.ImportFrom, updated: cst.ImportFrom):
-            # Keep star imports as-is
-            if any(isinstance(n, cst.ImportStar) for n in node.names):
-                return updated
-            new_names = []
+def _collect_used_names(tree: ast.AST, wanted: set[str] | None = None) -> set[str]:
+    # With ``wanted``, the walk stops as soon as every wanted name has been seen; the result
+    # is then only complete with respect to those names.
+    used_names: set[str] = set()
+    remaining = set(wanted) if wanted is not None else None
+    if remaining is not None and not remaining:
+        return used_names
+    for node in ast.walk(tree):
+        found: List[str] = []
+        if isinstance(node, ast.Name):
+            found.append(node.id)
+        elif isinstance(node, (ast.arg, ast.FunctionDef, ast.AsyncFunctionDef, ast.AnnAssign)):
+            # Names inside string annotations count as used
+            for annotation in _annotations(node):
+                for sub in ast.walk(annotation):
+                    if isinstance(sub, ast.Constant) and isinstance(sub.value, str):
+                        found.extend(_string_annotation_names(sub.value))
+        elif isinstance(node, (ast.Assign, ast.AugAssign)):
+            # Names re-exported through __all__ count as used
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            if any(isinstance(t, ast.Name) and t.id == "__all__" for t in targets) and isinstance(
+                node.value, (ast.List, ast.Tuple)
+            ):
+                for elt in node.value.elts:
+                    if isinstance(elt, ast.Constant) and isinstance(elt.value, str):
+                        found.append(elt.value)
+        if not found:
+            continue
+        used_names.update(found)
+        if remaining is not None:
+            remaining.difference_update(found)
+            if not remaining:
+                break
+    return used_names
+
+
+def _import_names(nodes: Iterable[ast.AST]) -> set[str]:
+    # Every name that can keep one of these imports alive
+    names: set[str] = set()
+    for node in nodes:
+        if isinstance(node, ast.ImportFrom):
+            if node.module == "__future__":
+                continue
             for alias in node.names:
-                if isinstance(alias.name, cst.Name) and alias.name.value in used_names:
-                    new_names.append(alias)
-                elif isinstance(alias, cst.ImportAlias) and alias.asname:
-                    # keep aliases if alias name used
-                    alias_name = alias.asname.name.value
-                    if alias_name in used_names:
-                        new_names.append(alias)
-            if not new_names:
-                return None
-            return updated.with_changes(names=tuple(new_names))
-
-        def leave_Import(self, node: cst.Import, updated: cst.Import):
-            new_names = []
+                if alias.name != "*":
+                    names.add(alias.name)
+                if alias.asname:
+                    names.add(alias.asname)
+        elif isinstance(node, ast.Import):
             for alias in node.names:
-                alias_name = (alias.asname.name.value if alias.asname else alias.name.value.split(".")[-1])
-                if alias_name in used_names:
-                    new_names.append(alias)
-            if not new_names:
-                return None
-            return updated.with_changes(names=tuple(new_names))
+                # 'import a.b' binds 'a'
+                names.add(alias.asname or alias.name.split(".")[0])
+    return names
 
-    new_mod = mod.visit(Prune())
-    return new_mod.code
 
+def _import_binding(alias: cst.ImportAlias) -> str:
+    if alias.asname:
+        return alias.asname.name.value
+    # 'import a.b' binds 'a'
+    node = alias.name
+    while isinstance(node, cst.Attribute):
+        node = node.value
+    return node.value
 
-def find_potential_dead_imports(path: Path, text: str) -> List[Tuple[str, int, str]]:
-    results: List[Tuple[str, int, str]] = []
-    try:
-        mod = cst.parse_module(text)
-    except Exception:
-        return results
-    used_names: set[str] = set()
 
-    class Usage(cst.CSTVisitor):
-        def visit_Name(self, node: cst.Name):
-            used_names.add(node.value)
+def _is_reexport(alias: cst.ImportAlias) -> bool:
+    # 'import a as a' and 'from x import y as y' are the explicit re-export spelling
+    return (
+        alias.asname is not None
+        and isinstance(alias.name, cst.Name)
+        and isinstance(alias.asname.name, cst.Name)
+        and alias.name.value == alias.asname.name.value
+    )
 
-    mod.visit(Usage())
 
-    class Checker(cst.CSTVisitor):
-        def visit_ImportFrom(self, node: cst.ImportFrom):
-            if any(isinstance(n, cst.ImportStar) for n in node.names):
-                return None
-            for alias in node.names:
-                if isinstance(alias.name, cst.Name):
-                    name = alias.asname.name.value if alias.asname else alias.name.value
-                    if name not in used_names:
-                        results.append((str(path), node.get_lines()[0], name))
-            return None
+def _prune_import(node: cst.Import, used_names: set[str]) -> cst.Import | None:
+    return _with_names(
+        node, [alias for alias in node.names if _is_reexport(alias) or _import_binding(alias) in used_names]
+    )
+
+
+def _prune_import_from(node: cst.ImportFrom, used_names: set[str]) -> cst.ImportFrom | None:
+    # Keep star imports and __future__ directives as-is
+    if isinstance(node.names, cst.ImportStar):
+        return node
+    if isinstance(node.module, cst.Name) and node.module.value == "__future__":
+        return node
+    new_names = []
+    for alias in node.names:
+        if _is_reexport(alias):
+            new_names.append(alias)
+        elif isinstance(alias.name, cst.Name) and alias.name.value in used_names:
+            new_names.append(alias)
+        elif alias.asname:
+            # keep aliases if alias name used
+            if alias.asname.name.value in used_names:
+                new_names.append(alias)
+    return _with_names(node, new_names)
 
-        def visit_Import(self, node: cst.Import):
+
+def _with_names(node, new_names):
+    if not new_names:
+        return None
+    if len(new_names) == len(node.names):
+        return node
+    last, dropped = new_names[-1], node.names[-1]
+    if last is dropped:
+        return node.with_changes(names=tuple(new_names))
+    comma = last.comma
+    if not (isinstance(comma, cst.Comma) and isinstance(comma.whitespace_after, cst.ParenthesizedWhitespace)):
+        # On one line the list now ends the way it did before, with or without a trailing comma
+        new_names[-1] = last.with_changes(comma=dropped.comma)
+        return node.with_changes(names=tuple(new_names))
+    # One alias per line inside parentheses: keep the comma and its comment, and close the list
+    # the way the dropped alias did
+    ws = comma.whitespace_after
+    tail = dropped.comma.whitespace_after if isinstance(dropped.comma, cst.Comma) else None
+    if isinstance(tail, cst.ParenthesizedWhitespace):
+        ws = ws.with_changes(empty_lines=tail.empty_lines, indent=tail.indent, last_line=tail.last_line)
+        new_names[-1] = last.with_changes(comma=comma.with_changes(whitespace_after=ws))
+        return node.with_changes(names=tuple(new_names))
+    new_names[-1] = last.with_changes(comma=comma.with_changes(whitespace_after=cst.SimpleWhitespace("")))
+    # The line break before ')' now follows this alias, so it takes over the comment
+    before = node.rpar.whitespace_before
+    if isinstance(before, cst.ParenthesizedWhitespace):
+        before = before.with_changes(first_line=ws.first_line)
+    else:
+        before = ws.with_changes(empty_lines=(), indent=False, last_line=cst.SimpleWhitespace(""))
+    return node.with_changes(names=tuple(new_names), rpar=node.rpar.with_changes(whitespace_before=before))
+
+
+def _prune_dead_imports(mod: cst.Module, used_names: set[str]) -> cst.Module:
+    # Only module-level import lines are pruned, so one pass over mod.body replaces a full
+    # tree transform; imports nested in functions or try blocks are conservatively kept.
+    new_body: List[cst.CSTNode] = []
+    changed = False
+    # Comments and blank lines above a dropped import line move to the next kept statement
+    carried: List[cst.EmptyLine] = []
+
+    def keep(stmt: cst.CSTNode) -> None:
+        if carried:
+            stmt = stmt.with_changes(leading_lines=(*carried, *stmt.leading_lines))
+            carried.clear()
+        new_body.append(stmt)
+
+    for stmt in mod.body:
+        if not isinstance(stmt, cst.SimpleStatementLine):
+            keep(stmt)
+            continue
+        small: List[cst.BaseSmallStatement] = []
+        for node in stmt.body:
+            if isinstance(node, cst.Import):
+                pruned = _prune_import(node, used_names)
+            elif isinstance(node, cst.ImportFrom):
+                pruned = _prune_import_from(node, used_names)
+            else:
+                pruned = node
+            if pruned is not None:
+                small.append(pruned)
+        if len(small) == len(stmt.body) and all(a is b for a, b in zip(small, stmt.body)):
+            keep(stmt)
+        elif _NOQA_RE.search(mod.code_for_node(stmt.with_changes(leading_lines=()))):
+            keep(stmt)
+        elif small:
+            changed = True
+            small[-1] = small[-1].with_changes(semicolon=cst.MaybeSentinel.DEFAULT)
+            keep(stmt.with_changes(body=small))
+        else:
+            changed = True
+            carried.extend(stmt.leading_lines)
+    if not changed:
+        return mod
+    return mod.with_changes(body=new_body, footer=(*carried, *mod.footer))
+
+
+def find_potential_dead_imports(
+    path: Path, text: str | bytes, tree: ast.Module | None = None
+) -> List[Tuple[str, int, str]]:
+    # Read-only check, so the stdlib parser is enough; libCST is kept for the rewriting paths
+    results: List[Tuple[str, int, str]] = []
+    if tree is None:
+        try:
+            tree = ast.parse(text)
+        except Exception:
+            return results
+    imports = [node for node in ast.walk(tree) if isinstance(node, (ast.Import, ast.ImportFrom))]
+    used_names = _collect_used_names(tree, _import_names(imports))
+    # bytes.splitlines breaks on the same line endings as the tokenizer, so ast line numbers index it
+    lines = (text.encode("utf-8") if isinstance(text, str) else text).splitlines()
+    for node in imports:
+        source = b"\n".join(lines[node.lineno - 1 : node.end_lineno]).decode("utf-8", "replace")
+        if _NOQA_RE.search(source):
+            continue
+        if isinstance(node, ast.ImportFrom):
+            if node.module == "__future__" or any(alias.name == "*" for alias in node.names):
+                continue
             for alias in node.names:
-                name = alias.asname.name.value if alias.asname else alias.name.value.split(".")[-1]
+                name = alias.asname or alias.name
+                # 'from x import y as y' is an explicit re-export
+                if alias.asname == alias.name:
+                    continue
                 if name not in used_names:
-                    results.append((str(path), node.get_lines()[0], name))
-            return None
-
-    mod.visit(Checker())
+                    results.append((str(path), node.lineno, name))
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                # 'import a.b' binds 'a'
+                name = alias.asname or alias.name.split(".")[0]
+                if alias.asname == alias.name:
+                    continue
+                if name not in used_names:
+                    results.append((str(path), node.lineno, name))
     return results
 
 
+def _tidy_one(f: Path, strip_hidden: bool, remove_dead_imports: bool) -> Tuple[Path, str, str]:
+    # Each step is guarded by a cheap scan so already-clean files are never parsed with libCST
+    original = read_text(f)
+    updated = _normalize_newlines(original)
+    if strip_hidden and _has_hidden(updated):
+        updated = _strip_hidden(updated)
+    # Package __init__ modules re-export names that look unused locally
+    if remove_dead_imports and f.name != "__init__.py" and "import" in updated:
+        try:
+            tree = ast.parse(updated)
+            # Only module-level imports are pruned, so only their names need to be looked for
+            wanted = _import_names(tree.body)
+            used_names = _collect_used_names(tree, wanted)
+            if not wanted <= used_names:
+                mod = parse_module_cached(f, updated)
+                pruned = _prune_dead_imports(mod, used_names)
+                if pruned is not mod:
+                    updated = pruned.code
+        except Exception:
+            pass
+    # Note: indentation normalization is intentionally conservative in prototype
+    return f, original, updated
+
+
 def tidy_files(
     files: List[Path],
     indent_style: str = "spaces",
@@ -114,16 +307,8 @@ def tidy_files(
     remove_dead_imports: bool = True,
 ) -> ChangeSet:
     cs = ChangeSet()
-    for f in files:
-        original = read_text(f)
-        updated = _normalize_newlines(original)
-        if strip_hidden:
-            updated = _strip_hidden(updated)
-        if remove_dead_imports:
-            updated = _remove_dead_imports_in_module(updated)
-        # Note: indentation normalization is intentionally conservative in prototype
+    tidy_one = functools.partial(_tidy_one, strip_hidden=strip_hidden, remove_dead_imports=remove_dead_imports)
+    for f, original, updated in map_files(tidy_one, files):
         if updated != original:
             cs.add(f, original, updated)
     return cs
-
-
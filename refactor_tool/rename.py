@@ -2,14 +2,20 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Set
+from typing import Dict, List, Mapping, Optional, Tuple, Set
+import functools
+import mmap
+import os
+import re
+import sys
 
 import libcst as cst
 from libcst import matchers as m
-from libcst.metadata import PositionProvider, ParentNodeProvider
+from libcst.metadata import FunctionScope, PositionProvider, ParentNodeProvider, Scope, ScopeProvider
 
+from .ast_cache import load_module, parse_source_cached
 from .diff_utils import ChangeSet
-from .project import module_path_from_file, read_text
+from .project import decode_text, files_containing, map_files, module_path_from_file
 
 
 @dataclass
@@ -17,117 +23,389 @@ class RenameError(Exception):
     message: str
 
 
+try:
+    from ._fastsub import word_boundary_sub
+except ImportError:  # extension not built; the regex below gives the same result
+    word_boundary_sub = None
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_word_boundary(old: str) -> "re.Pattern[str]":
+    return re.compile(rf"(?<!\w){re.escape(old)}(?!\w)")
+
+
 def _update_docstrings_and_type_strings(text: str, old: str, new: str) -> str:
     # Simple word-boundary replace for docstrings and forward refs
-    import re
-    pattern = re.compile(rf"(?<!\w){re.escape(old)}(?!\w)")
-    return pattern.sub(new, text)
+    if old not in text:
+        return text
+    if word_boundary_sub is not None:
+        return word_boundary_sub(text, old, new)
+    updated, count = _compile_word_boundary(old).subn(new, text)
+    return updated if count else text
 
 
-def _has_top_level_definition(mod: cst.Module, name: str) -> bool:
+def _top_level_defs(mod: cst.Module) -> Dict[str, Tuple[str, cst.CSTNode]]:
+    # {name: ("function" | "class", node)} in one pass; the first definition of a name wins
+    defs: Dict[str, Tuple[str, cst.CSTNode]] = {}
     for stmt in mod.body:
-        if isinstance(stmt, (cst.FunctionDef, cst.ClassDef)) and stmt.name.value == name:
-            return True
-    return False
+        if isinstance(stmt, cst.FunctionDef):
+            defs.setdefault(stmt.name.value, ("function", stmt))
+        elif isinstance(stmt, cst.ClassDef):
+            defs.setdefault(stmt.name.value, ("class", stmt))
+    return defs
+
 
+class StringRenamer(cst.CSTTransformer):
+    """Base transformer applying the word-boundary rename to docstrings, forward refs and comments.
 
-class LocalVarRenamer(cst.CSTTransformer):
-    def __init__(self, target_function: str, target_class: Optional[str], old: str, new: str) -> None:
-        self.target_function = target_function
-        self.target_class = target_class
+    Code references are left to subclasses, which know which ``Name`` nodes really refer to the
+    renamed symbol. Text outside those nodes is only rewritten while ``self.active`` is set.
+    """
+
+    def __init__(self, old: str, new: str) -> None:
+        super().__init__()
         self.old = old
         self.new = new
-        self._in_class = False
-        self._in_function = False
+        # one shared replacement node; libCST nodes are immutable, so it is safe to reuse
+        self.new_name_node = cst.Name(new)
+        self.active = True
 
-    def visit_ClassDef(self, node: cst.ClassDef) -> Optional[bool]:
-        if self.target_class and node.name.value == self.target_class:
-            self._in_class = True
-        return None
+    def _rename_text(self, node: cst.CSTNode, value: str) -> cst.CSTNode:
+        if not self.active:
+            return node
+        updated = _update_docstrings_and_type_strings(value, self.old, self.new)
+        return node if updated is value else node.with_changes(value=updated)
 
-    def leave_ClassDef(self, node: cst.ClassDef, updated: cst.ClassDef) -> cst.CSTNode:
-        if self.target_class and node.name.value == self.target_class:
-            self._in_class = False
-        return updated
+    def leave_SimpleString(self, node: cst.SimpleString, updated: cst.SimpleString) -> cst.CSTNode:
+        return self._rename_text(updated, updated.value)
+
+    def leave_FormattedStringText(
+        self, node: cst.FormattedStringText, updated: cst.FormattedStringText
+    ) -> cst.CSTNode:
+        return self._rename_text(updated, updated.value)
+
+    def leave_Comment(self, node: cst.Comment, updated: cst.Comment) -> cst.CSTNode:
+        return self._rename_text(updated, updated.value)
+
+
+class LocalVarRenamer(StringRenamer):
+    """Rename exactly the ``Name`` nodes whose ids are in ``targets``, leaving lookalikes alone.
+
+    String and comment text is only rewritten inside ``func``.
+    """
+
+    def __init__(self, func: cst.FunctionDef, targets: Set[int], old: str, new: str) -> None:
+        super().__init__(old, new)
+        self.func = func
+        self.targets = targets
+        self.active = False
 
     def visit_FunctionDef(self, node: cst.FunctionDef) -> Optional[bool]:
-        if (not self.target_class or self._in_class) and node.name.value == self.target_function:
-            self._in_function = True
+        if node is self.func:
+            self.active = True
         return None
 
     def leave_FunctionDef(self, node: cst.FunctionDef, updated: cst.FunctionDef) -> cst.CSTNode:
-        if (not self.target_class or self._in_class) and node.name.value == self.target_function:
-            self._in_function = False
+        if node is self.func:
+            self.active = False
         return updated
 
     def leave_Name(self, node: cst.Name, updated: cst.Name) -> cst.CSTNode:
-        if self._in_function and node.value == self.old:
+        if id(node) in self.targets:
             return updated.with_changes(value=self.new)
         return updated
 
 
-def _collect_assigned_names(func: cst.FunctionDef) -> Set[str]:
-    assigned: Set[str] = set()
+def _function_scope(scopes: Mapping[cst.CSTNode, Optional[Scope]], func: cst.FunctionDef) -> FunctionScope:
+    # every function body holds at least one statement, so its FunctionScope is always present
+    return next(
+        scope for scope in set(scopes.values()) if isinstance(scope, FunctionScope) and scope.node is func
+    )
 
-    class AssignVisitor(cst.CSTVisitor):
-        def visit_Param(self, node: cst.Param) -> Optional[bool]:
-            assigned.add(node.name.value)
-            return None
 
-        def visit_AssignTarget(self, node: cst.AssignTarget) -> Optional[bool]:
-            target = node.target
-            if isinstance(target, cst.Name):
-                assigned.add(target.value)
-            return None
-
-        def visit_AugAssign(self, node: cst.AugAssign) -> Optional[bool]:
-            if isinstance(node.target, cst.Name):
-                assigned.add(node.target.value)
-            return None
-
-        def visit_For(self, node: cst.For) -> Optional[bool]:
-            if isinstance(node.target, cst.Name):
-                assigned.add(node.target.value)
-            return None
+def _is_nested_in(scope: Scope, ancestor: Scope) -> bool:
+    # the global and builtin scopes are their own parents, which ends the walk
+    while scope.parent is not scope:
+        scope = scope.parent
+        if scope is ancestor:
+            return True
+    return False
 
-        def visit_With(self, node: cst.With) -> Optional[bool]:
-            for item in node.items:
-                if item.asname and isinstance(item.asname.name, cst.Name):
-                    assigned.add(item.asname.name.value)
-            return None
 
-    func.visit(AssignVisitor())
-    return assigned
+def _local_rename_targets(func_scope: FunctionScope, name: str) -> Set[int]:
+    # ids of the binding and every resolved reference of ``name`` bound in ``func_scope``;
+    # attributes, keyword arguments and inner rebinding scopes are not references
+    assignments = func_scope.assignments[name]
+    if not assignments:
+        # Only read here (a global, builtin or enclosing variable): there is no local to rename
+        raise RenameError("Symbol is not a parameter or local variable of the target function.")
+    targets: Set[int] = set()
+    for assignment in assignments:
+        node = getattr(assignment, "node", None)
+        if isinstance(node, (cst.Param, cst.FunctionDef, cst.ClassDef)):
+            node = node.name
+        if not isinstance(node, cst.Name):
+            raise RenameError("Only parameters and assigned local variables can be renamed.")
+        targets.add(id(node))
+        targets.update(id(access.node) for access in assignment.references)
+    return targets
+
+
+def _would_shadow(scopes: Mapping[cst.CSTNode, Optional[Scope]], func_scope: FunctionScope, name: str) -> bool:
+    # ``name`` is already bound in the function, or read there (or in a nested scope that does
+    # not bind it itself) and would be captured by the renamed variable
+    if func_scope.assignments[name] or func_scope.accesses[name]:
+        return True
+    for scope in set(scopes.values()):
+        if scope is None or not _is_nested_in(scope, func_scope):
+            continue
+        if scope.accesses[name] and not scope.assignments[name]:
+            return True
+    return False
 
 
 def _find_function(mod: cst.Module, function_name: str, class_name: Optional[str]) -> Optional[cst.FunctionDef]:
+    defs = _top_level_defs(mod)
     if class_name:
-        for stmt in mod.body:
-            if isinstance(stmt, cst.ClassDef) and stmt.name.value == class_name:
-                for elem in stmt.body.body:
-                    if isinstance(elem, cst.FunctionDef) and elem.name.value == function_name:
-                        return elem
-        return None
-    else:
-        for stmt in mod.body:
-            if isinstance(stmt, cst.FunctionDef) and stmt.name.value == function_name:
-                return stmt
+        kind, node = defs.get(class_name, (None, None))
+        if kind != "class":
+            return None
+        # only the class body is searched for the method
+        for elem in node.body.body:
+            if isinstance(elem, cst.FunctionDef) and elem.name.value == function_name:
+                return elem
         return None
+    kind, node = defs.get(function_name, (None, None))
+    return node if kind == "function" else None
 
 
 def _dotted_name_from_node(node: cst.CSTNode) -> Optional[str]:
-    # Convert Name or Attribute to 'a.b.c' string
-    if isinstance(node, cst.Name):
-        return node.value
-    if isinstance(node, cst.Attribute):
-        left = _dotted_name_from_node(node.value)
-        right = node.attr.value if isinstance(node.attr, cst.Name) else None
-        if left and right:
-            return f"{left}.{right}"
-        return left or right
+    # Convert Name or Attribute to 'a.b.c' string; anything else (calls, subscripts) is None
+    parts: List[str] = []
+    while isinstance(node, cst.Attribute):
+        parts.append(node.attr.value)
+        node = node.value
+    if not isinstance(node, cst.Name):
+        return None
+    parts.append(node.value)
+    return ".".join(reversed(parts))
+
+
+def _open_mm(path: Path) -> mmap.mmap:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+
+
+def _asname(alias: cst.ImportAlias) -> Optional[str]:
+    if alias.asname and isinstance(alias.asname.name, cst.Name):
+        return alias.asname.name.value
     return None
 
 
+class DefRename(StringRenamer):
+    """Rename the definition of ``old`` and every reference to it in the defining module."""
+
+    def leave_FunctionDef(self, node: cst.FunctionDef, updated: cst.FunctionDef) -> cst.CSTNode:
+        if node.name.value == self.old:
+            return updated.with_changes(name=self.new_name_node)
+        return updated
+
+    def leave_ClassDef(self, node: cst.ClassDef, updated: cst.ClassDef) -> cst.CSTNode:
+        if node.name.value == self.old:
+            return updated.with_changes(name=self.new_name_node)
+        return updated
+
+    def leave_Name(self, node: cst.Name, updated: cst.Name) -> cst.CSTNode:
+        if node.value == self.old:
+            return updated.with_changes(value=self.new)
+        return updated
+
+
+class ImportCollector(cst.CSTVisitor):
+    """Read-only pass recording how a file imports the defining module (no node allocation).
+
+    ``imports_symbol`` is set for ``from module import symbol``; ``module_aliases`` collects the
+    names (or dotted paths) through which the module itself is reachable.
+    """
+
+    def __init__(self, symbol_name: str, module_path: Optional[str], module_last: Optional[str]) -> None:
+        super().__init__()
+        self.symbol_name = symbol_name
+        self.module_path = module_path
+        self.module_last = module_last
+        self.imports_symbol = False
+        self.module_aliases: Set[str] = set()
+        # ImportFrom nodes are inspected by both passes; resolve each dotted module name once
+        self._module_names: Dict[int, Optional[str]] = {}
+
+    def module_name(self, node: cst.ImportFrom) -> Optional[str]:
+        key = id(node)
+        if key not in self._module_names:
+            self._module_names[key] = _dotted_name_from_node(node.module) if node.module else None
+        return self._module_names[key]
+
+    def matches_module(self, node: cst.ImportFrom) -> bool:
+        # from module_path import symbol_name [as alias]
+        module_str = self.module_name(node)
+        if not (self.module_path and module_str) or isinstance(node.names, cst.ImportStar):
+            return False
+        # match either fully qualified or last segment for simple/relative imports
+        return module_str == self.module_path or module_str == self.module_last
+
+    def visit_ImportFrom(self, node: cst.ImportFrom) -> Optional[bool]:
+        if self.matches_module(node) and any(
+            isinstance(n.name, cst.Name) and n.name.value == self.symbol_name for n in node.names
+        ):
+            self.imports_symbol = True
+        # 'from package import module' (or 'from . import module') binds the module itself
+        if self.module_path and not isinstance(node.names, cst.ImportStar):
+            module_str = self.module_name(node)
+            for alias_node in node.names:
+                if not isinstance(alias_node.name, cst.Name):
+                    continue
+                name = alias_node.name.value
+                full = f"{module_str}.{name}" if module_str else name
+                if full == self.module_path or (node.relative and name == self.module_last):
+                    self.module_aliases.add(_asname(alias_node) or name)
+        return None
+
+    def visit_Import(self, node: cst.Import) -> Optional[bool]:
+        # If imported via 'import module', attribute access module.old -> module.new is renamed
+        for alias_node in node.names:
+            full = _dotted_name_from_node(alias_node.name)
+            if self.module_path and full == self.module_path:
+                # without 'as', 'import a.b' is reached through the full dotted path
+                self.module_aliases.add(_asname(alias_node) or full)
+        return None
+
+
+class ProjectFileRewriter(StringRenamer):
+    """Single pass performing the import, attribute and bare-name rewrites in a project file."""
+
+    def __init__(self, imports: ImportCollector, new_name: str, bare_targets: Set[int]) -> None:
+        super().__init__(imports.symbol_name, new_name)
+        self.imports = imports
+        self.bare_targets = bare_targets
+        self.changed = False
+
+    def leave_ImportFrom(self, node: cst.ImportFrom, updated: cst.ImportFrom) -> cst.CSTNode:
+        if not self.imports.matches_module(node):
+            return updated
+        new_names = []
+        modified_local = False
+        for original, n in zip(node.names, updated.names):
+            if isinstance(original.name, cst.Name) and original.name.value == self.old:
+                # replace the imported name
+                new_names.append(n.with_changes(name=self.new_name_node))
+                modified_local = True
+            else:
+                new_names.append(n)
+        if modified_local:
+            self.changed = True
+            return updated.with_changes(names=tuple(new_names))
+        return updated
+
+    def leave_Attribute(self, node: cst.Attribute, updated: cst.Attribute) -> cst.CSTNode:
+        if _dotted_name_from_node(node.value) in self.imports.module_aliases:
+            if isinstance(node.attr, cst.Name) and node.attr.value == self.old:
+                self.changed = True
+                return updated.with_changes(attr=self.new_name_node)
+        return updated
+
+    def leave_Name(self, node: cst.Name, updated: cst.Name) -> cst.CSTNode:
+        if id(node) in self.bare_targets:
+            self.changed = True
+            return updated.with_changes(value=self.new)
+        return updated
+
+
+def _rename_in_file(
+    f: Path,
+    symbol_name: str,
+    new_name: str,
+    module_path: Optional[str],
+    module_last: Optional[str] = None,
+    symbol_bytes: Optional[bytes] = None,
+    module_bytes: Optional[bytes] = None,
+) -> Optional[Tuple[Path, str, str]]:
+    """Rewrite imports and references of ``symbol_name`` in one project file.
+
+    Returns ``(path, original, updated)`` when the file changes. Kept at module level so it can
+    run in worker processes. ``module_last``, ``symbol_bytes`` and ``module_bytes`` (the encoded
+    last module segment) are derived from ``module_path``/``symbol_name`` when not precomputed by
+    the caller.
+    """
+    # arguments arrive unpickled in worker processes, so intern them here as well
+    symbol_name = sys.intern(symbol_name)
+    new_name = sys.intern(new_name)
+    if module_last is None and module_path:
+        module_last = module_path.split(".")[-1]
+    if symbol_bytes is None:
+        symbol_bytes = symbol_name.encode("utf-8")
+    if module_bytes is None and module_last:
+        module_bytes = module_last.encode("utf-8")
+    try:
+        mm = _open_mm(f)
+    except ValueError:
+        # mmap refuses empty files, which cannot mention the symbol anyway
+        return None
+    with mm:
+        # Nothing can change unless the symbol is spelled somewhere in the file; searching the
+        # mapped bytes first skips decoding and parsing the vast majority of files in a project.
+        # Every import form ImportCollector matches also spells the module's last segment.
+        if mm.find(symbol_bytes) == -1 or (module_bytes and mm.find(module_bytes) == -1):
+            return None
+        try:
+            mod = parse_source_cached(f, mm)
+        except Exception:
+            return None
+        return _rewrite_project_file(f, mm, mod, symbol_name, new_name, module_path, module_last)
+
+
+def _rewrite_project_file(
+    f: Path,
+    raw: mmap.mmap,
+    mod: cst.Module,
+    symbol_name: str,
+    new_name: str,
+    module_path: Optional[str],
+    module_last: Optional[str],
+) -> Optional[Tuple[Path, str, str]]:
+    # ``raw`` stays mapped for the whole rewrite; the original text is only decoded on a change
+
+    # Pass 1: how does this file import the defining module?
+    imports = ImportCollector(symbol_name, module_path, module_last)
+    mod.visit(imports)
+    if not imports.imports_symbol and not imports.module_aliases:
+        return None
+
+    # Bare uses are renamed only where scope analysis resolves them to the matching import, so
+    # locals, parameters and attributes that merely share the name are left alone
+    bare_targets: Set[int] = set()
+    if imports.imports_symbol:
+        scopes = cst.MetadataWrapper(mod, unsafe_skip_copy=True).resolve(ScopeProvider)
+        for scope in set(scopes.values()):
+            if scope is None:
+                continue
+            for assignment in scope.assignments[symbol_name]:
+                node = getattr(assignment, "node", None)
+                if isinstance(node, cst.ImportFrom) and imports.matches_module(node):
+                    bare_targets.update(id(access.node) for access in assignment.references)
+
+    # Pass 2: a single transformer performs the import, attribute and bare-name rewrites
+    rewriter = ProjectFileRewriter(imports, new_name, bare_targets)
+    updated_mod = mod.visit(rewriter)
+
+    # docstring and comment edits alone do not make a file part of the rename. A rewritten
+    # reference always alters the text, so the module is rendered once and never compared
+    if not rewriter.changed:
+        return None
+    return f, decode_text(raw[:]), updated_mod.code
+
+
 def rename_entrypoint(
     root_path: Path,
     files: List[Path],
@@ -136,173 +414,88 @@ def rename_entrypoint(
     new_name: str,
     function_name: Optional[str],
     class_name: Optional[str],
+    jobs: Optional[int] = None,
 ) -> ChangeSet:
     """Entry point for rename operations.
 
     - If function_name is provided: local variable rename inside that function in the given file_path.
     - Else if file_path is provided: rename a top-level function or class across project.
+
+    ``jobs`` caps the worker processes used for the project-wide scan; 1 runs it serially.
     """
+    # names are compared against every Name node; interned strings hit the identity fast path
+    symbol_name = sys.intern(symbol_name)
+    new_name = sys.intern(new_name)
     if symbol_name == new_name:
         raise RenameError("Old and new names are identical.")
 
-    changes = ChangeSet()
+    changes = ChangeSet(spool=True)
 
     if function_name:
         if not file_path:
             raise RenameError("--file is required for local variable rename.")
-        text = read_text(file_path)
-        mod = cst.parse_module(text)
+        text, mod = load_module(file_path)
         func = _find_function(mod, function_name, class_name)
         if not func:
             raise RenameError("Target function not found.")
-        # collision check
-        assigned = _collect_assigned_names(func)
-        if new_name in assigned and symbol_name != new_name:
+        # scope metadata pins down the real binding; the cached module is never mutated, so
+        # the defensive deep copy is skipped and node ids stay valid for the transformer
+        scopes = cst.MetadataWrapper(mod, unsafe_skip_copy=True).resolve(ScopeProvider)
+        func_scope = _function_scope(scopes, func)
+        if _would_shadow(scopes, func_scope, new_name):
             raise RenameError("Rename would shadow an existing symbol in the function scope.")
-        transformer = LocalVarRenamer(function_name, class_name, symbol_name, new_name)
-        new_mod = mod.visit(transformer)
-        updated = _update_docstrings_and_type_strings(new_mod.code, symbol_name, new_name)
-        changes.add(file_path, text, updated)
+        targets = _local_rename_targets(func_scope, symbol_name)
+        new_mod = mod.visit(LocalVarRenamer(func, targets, symbol_name, new_name))
+        changes.add(file_path, text, new_mod.code)
         return changes
 
     # project-wide top-level rename
     if not file_path:
         raise RenameError("--file is required to identify the defining module for project-wide rename.")
 
-    defining_text = read_text(file_path)
-    defining_mod = cst.parse_module(defining_text)
+    defining_text, defining_mod = load_module(file_path)
     # verify definition exists and type
-    kind: Optional[str] = None
-    for stmt in defining_mod.body:
-        if isinstance(stmt, cst.FunctionDef) and stmt.name.value == symbol_name:
-            kind = "function"
-            break
-        if isinstance(stmt, cst.ClassDef) and stmt.name.value == symbol_name:
-            kind = "class"
-            break
-    if not kind:
+    defs = _top_level_defs(defining_mod)
+    if symbol_name not in defs:
         raise RenameError("Symbol not defined at top-level in the given file.")
 
-    if _has_top_level_definition(defining_mod, new_name):
+    if new_name in defs:
         raise RenameError("Rename would collide with an existing top-level definition in defining file.")
 
     # update defining file name and internal references
-    class DefRename(cst.CSTTransformer):
-        def leave_FunctionDef(self, node: cst.FunctionDef, updated: cst.FunctionDef) -> cst.CSTNode:
-            if node.name.value == symbol_name:
-                return updated.with_changes(name=cst.Name(new_name))
-            return updated
-
-        def leave_ClassDef(self, node: cst.ClassDef, updated: cst.ClassDef) -> cst.CSTNode:
-            if node.name.value == symbol_name:
-                return updated.with_changes(name=cst.Name(new_name))
-            return updated
-
-        def leave_Name(self, node: cst.Name, updated: cst.Name) -> cst.CSTNode:
-            if node.value == symbol_name:
-                return updated.with_changes(value=new_name)
-            return updated
-
-    new_def_mod = defining_mod.visit(DefRename())
-    new_def_text = _update_docstrings_and_type_strings(new_def_mod.code, symbol_name, new_name)
-    changes.add(file_path, defining_text, new_def_text)
+    new_def_mod = defining_mod.visit(DefRename(symbol_name, new_name))
+    changes.add(file_path, defining_text, new_def_mod.code)
 
     # compute module path
     module_path = module_path_from_file(root_path, file_path)
-
-    # update other files' imports and attribute references
-    for f in files:
-        text = read_text(f)
-        try:
-            mod = cst.parse_module(text)
-        except Exception:
-            continue
-
-        updated_mod = mod
-        changed = False
-
-        replaced_symbol_in_module = False
-
-        class ImportRename(cst.CSTTransformer):
-            def leave_ImportFrom(self, node: cst.ImportFrom, updated: cst.ImportFrom) -> cst.CSTNode:
-                nonlocal changed
-                nonlocal replaced_symbol_in_module
-                # from module_path import symbol_name [as alias]
-                module_str = _dotted_name_from_node(node.module) if node.module else None
-                matches_module = False
-                if module_path and module_str and node.names:
-                    # match either fully qualified or last segment for simple/relative imports
-                    last = module_path.split(".")[-1]
-                    if module_str == module_path or module_str == last:
-                        matches_module = True
-                if matches_module:
-                    new_names = []
-                    modified_local = False
-                    for n in node.names:
-                        if isinstance(n.name, cst.Name) and n.name.value == symbol_name:
-                            # replace the imported name
-                            new_names.append(n.with_changes(name=cst.Name(new_name)))
-                            modified_local = True
-                        else:
-                            new_names.append(n)
-                    if modified_local:
-                        changed = True
-                        replaced_symbol_in_module = True
-                        return updated.with_changes(names=tuple(new_names))
-                return updated
-
-            def leave_Import(self, node: cst.Import, updated: cst.Import) -> cst.CSTNode:
-                # nothing to change in 'import module' here
-                return updated
-
-        updated_mod = updated_mod.visit(ImportRename())
-
-        # If imported via 'import module', update attribute access module.old -> module.new
-        # Build set of module aliases for module_path
-        module_aliases: Set[str] = set()
-
-        class ImportAliasCollector(cst.CSTVisitor):
-            def visit_Import(self, node: cst.Import) -> Optional[bool]:
-                for alias_node in node.names:
-                    full = _dotted_name_from_node(alias_node.name)
-                    if not full:
-                        continue
-                    alias_name = alias_node.asname.name.value if alias_node.asname else full.split(".")[-1]
-                    if module_path and full == module_path:
-                        module_aliases.add(alias_name)
-                return None
-
-        updated_mod.visit(ImportAliasCollector())
-
-        if module_aliases:
-            class AttrRename(cst.CSTTransformer):
-                def leave_Attribute(self, node: cst.Attribute, updated: cst.Attribute) -> cst.CSTNode:
-                    nonlocal changed
-                    if isinstance(node.value, cst.Name) and node.value.value in module_aliases:
-                        if isinstance(node.attr, cst.Name) and node.attr.value == symbol_name:
-                            changed = True
-                            return updated.with_changes(attr=cst.Name(new_name))
-                    return updated
-
-            updated_mod = updated_mod.visit(AttrRename())
-
-        # If we replaced an imported symbol name, also rename bare Name uses
-        if replaced_symbol_in_module:
-            class BareNameRename(cst.CSTTransformer):
-                def leave_Name(self, node: cst.Name, updated: cst.Name) -> cst.CSTNode:
-                    nonlocal changed
-                    if node.value == symbol_name:
-                        changed = True
-                        return updated.with_changes(value=new_name)
-                    return updated
-
-            updated_mod = updated_mod.visit(BareNameRename())
-
-        if updated_mod.code != text:
-            updated_text = _update_docstrings_and_type_strings(updated_mod.code, symbol_name, new_name)
-            if updated_text != text:
-                changes.add(f, text, updated_text)
+    if module_path is None:
+        # outside the root no other file can name the module, so there is nothing to scan
+        return changes
+    module_path = sys.intern(module_path)
+    module_last = module_path.split(".")[-1]
+
+    # update other files' imports and attribute references; each file is independent, so the
+    # CST work fans out to worker processes while the ChangeSet is only touched here
+    rename_one = functools.partial(
+        _rename_in_file,
+        symbol_name=symbol_name,
+        new_name=new_name,
+        module_path=module_path,
+        module_last=module_last,
+        symbol_bytes=symbol_name.encode("utf-8"),
+        module_bytes=module_last.encode("utf-8"),
+    )
+    # DefRename already rewrote every reference in the defining module; scanning it again would
+    # only re-read and re-parse it and could replace that change with a partial one
+    files = [f for f in files if f != file_path]
+    # ripgrep narrows large listings far faster than reading every file here; without it the
+    # byte check in _rename_in_file does the same job per file
+    candidates = files_containing(files, symbol_name)
+    if candidates is not None:
+        files = candidates
+    workers = jobs or os.cpu_count() or 1
+    for result in map_files(rename_one, files, jobs=jobs, chunksize=max(1, len(files) // (4 * workers))):
+        if result is not None:
+            changes.add(*result)
 
     return changes
-
-
@@ -0,0 +1,18 @@
+import os
+
+from refactor_tool.diff_utils import ChangeSet
+
+
+def test_apply_writes_through_symlink(tmp_path):
+    real = tmp_path / "real.py"
+    real.write_text("x = 1\n", encoding="utf-8")
+    real.chmod(0o640)
+    link = tmp_path / "link.py"
+    link.symlink_to(real)
+    cs = ChangeSet()
+    cs.add(link, "x = 1\n", "x = 2\n")
+    cs.apply()
+    assert link.is_symlink()
+    assert real.read_text(encoding="utf-8") == "x = 2\n"
+    assert real.stat().st_mode & 0o777 == 0o640
+    assert sorted(os.listdir(tmp_path)) == ["link.py", "real.py"]
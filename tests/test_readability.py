@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import pytest
+
+from refactor_tool.readability import _tidy_one, find_potential_dead_imports
+
+
+@pytest.fixture(autouse=True)
+def no_disk_cache(monkeypatch):
+    monkeypatch.setenv("REFACTOR_TOOL_CACHE_DIR", "")
+
+
+def tidy(tmp_path: Path, source: str, name: str = "mod.py") -> str:
+    f = tmp_path / name
+    f.write_text(source, encoding="utf-8")
+    _, _, updated = _tidy_one(f, strip_hidden=True, remove_dead_imports=True)
+    return updated
+
+
+def test_unused_import_is_removed(tmp_path):
+    assert tidy(tmp_path, "import os\nimport sys\nprint(sys)\n") == "import sys\nprint(sys)\n"
+
+
+def test_noqa_import_is_kept(tmp_path):
+    source = "import os  # noqa: F401\nfrom typing import (  # NOQA\n    List,\n    Dict,\n)\n"
+    assert tidy(tmp_path, source) == source
+    assert find_potential_dead_imports(tmp_path / "mod.py", source) == []
+
+
+def test_noqa_above_import_does_not_keep_it(tmp_path):
+    assert tidy(tmp_path, "# noqa\nimport os\nx = 1\n") == "# noqa\nx = 1\n"
+
+
+def test_as_alias_reexport_is_kept(tmp_path):
+    source = "import os as os\nfrom typing import List as List, Dict\n"
+    assert tidy(tmp_path, source) == "import os as os\nfrom typing import List as List\n"
+    assert find_potential_dead_imports(tmp_path / "mod.py", source) == [(str(tmp_path / "mod.py"), 2, "Dict")]
+
+
+def test_names_in_all_are_kept(tmp_path):
+    source = "from typing import List, Dict\n__all__ = ['List']\n"
+    assert tidy(tmp_path, source) == "from typing import List\n__all__ = ['List']\n"
+
+
+def test_package_init_is_skipped(tmp_path):
+    source = "from .core import helper\n"
+    assert tidy(tmp_path, source, name="__init__.py") == source
+
+
+def test_string_annotations_count_as_used(tmp_path):
+    source = "from collections import OrderedDict\nfrom typing import List\n\ndef f(x: \"List['OrderedDict']\") -> None:\n    pass\n"
+    assert tidy(tmp_path, source) == source
+
+
+def test_pruning_last_alias_keeps_comments_and_layout(tmp_path):
+    source = "from q import (\n    c,  # keep c\n    d,  # drop d\n)\nprint(c)\n"
+    assert tidy(tmp_path, source) == "from q import (\n    c,  # keep c\n)\nprint(c)\n"
+    assert tidy(tmp_path, "from q import c, d  # comment\nprint(c)\n") == "from q import c  # comment\nprint(c)\n"
@@ -0,0 +1,26 @@
+import pytest
+
+from refactor_tool.rename import RenameError, rename_entrypoint
+
+
+@pytest.fixture(autouse=True)
+def no_disk_cache(monkeypatch):
+    monkeypatch.setenv("REFACTOR_TOOL_CACHE_DIR", "")
+
+
+def local_rename(tmp_path, source, old, new):
+    f = tmp_path / "mod.py"
+    f.write_text(source, encoding="utf-8")
+    return rename_entrypoint(tmp_path, [f], f, old, new, "f", None)
+
+
+def test_local_rename_updates_binding_and_references(tmp_path):
+    source = "def f(x):\n    y = x + 1\n    return y\n"
+    (change,) = list(local_rename(tmp_path, source, "y", "total"))
+    assert change.updated == "def f(x):\n    total = x + 1\n    return total\n"
+
+
+def test_local_rename_refuses_name_only_read_in_function(tmp_path):
+    source = 'LIMIT = 3\n\ndef f(x):\n    """Clamp to LIMIT."""\n    return min(x, LIMIT)  # LIMIT\n'
+    with pytest.raises(RenameError):
+        local_rename(tmp_path, source, "LIMIT", "MAX")